@@ -0,0 +1,49 @@
+# cython: language_level=3
+"""
+Compiled versions of the primitive fast paths in `jsonserde.asdict` and `jsonserde.fromdict`.
+
+Optional: both modules keep pure-Python definitions with the same signatures and only rebind to these when the
+extension has been built (e.g. `cythonize -i jsonserde/_fastpath.pyx`).
+"""
+
+
+cpdef object _dictify_list_primitives(object obj, set primitives):
+    cdef object item
+
+    if type(obj) is list:
+        for item in <list>obj:
+            if type(item) not in primitives:
+                return None
+        return (<list>obj)[:]
+
+    for item in obj:
+        if type(item) not in primitives:
+            return None
+    return list(obj)
+
+
+cpdef object _dictify_dict_primitives(object obj, set primitives):
+    cdef object value
+
+    if type(obj) is dict:
+        for value in (<dict>obj).values():
+            if type(value) not in primitives:
+                return None
+        return (<dict>obj).copy()
+
+    for value in obj.values():
+        if type(value) not in primitives:
+            return None
+    return dict(obj)
+
+
+cpdef object _decode_scalar_list(object value, type inner):
+    cdef object item
+
+    if type(value) is not list:
+        return None
+
+    for item in <list>value:
+        if type(item) is not inner:
+            return None
+    return (<list>value)[:]
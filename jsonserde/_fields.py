@@ -0,0 +1,29 @@
+import dataclasses
+from typing import Any, FrozenSet, Tuple
+
+
+def _is_dataclass_field_required(field: dataclasses.Field) -> bool:
+    return isinstance(field.default, dataclasses._MISSING_TYPE) \
+           and isinstance(field.default_factory, dataclasses._MISSING_TYPE)
+
+
+def _fields_cache(cls) -> Tuple[Tuple[str, Any, bool], ...]:
+    """(name, type, required) for every field of dataclass `cls`, computed once and stored on the class."""
+    fs = cls.__dict__.get('__jsonserde_fields__')
+    if fs is None:
+        fs = tuple(
+            (f.name, f.type, _is_dataclass_field_required(f))
+            for f in dataclasses.fields(cls)
+        )
+        cls.__jsonserde_fields__ = fs
+
+    return fs
+
+
+def _required_fields(cls) -> FrozenSet[str]:
+    required = cls.__dict__.get('__jsonserde_required__')
+    if required is None:
+        required = frozenset(name for name, _, is_required in _fields_cache(cls) if is_required)
+        cls.__jsonserde_required__ = required
+
+    return required
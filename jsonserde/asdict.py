@@ -1,9 +1,14 @@
-from typing import Mapping, Sequence, Optional, Iterable
+from typing import Mapping, Sequence, Optional, Iterable, FrozenSet
 from enum import Enum
-from dataclasses import is_dataclass, fields
-from functools import singledispatch
+from dataclasses import is_dataclass
+from functools import singledispatch, lru_cache
+import inspect
+from collections import deque
+from types import GeneratorType
 from pydantic import BaseModel
 
+from jsonserde._fields import _fields_cache
+
 __all__ = (
     'dict_encoder',
     'dictify',
@@ -16,63 +21,248 @@ def dict_encoder(obj):
     raise NotImplementedError(f'Object {repr(obj)} of {type(obj)} cannot be encoded as dictionary!!!')
 
 
-def dictify(obj):
-    try:
-        return dictify(obj.__dictify__())
-    except AttributeError:
-        pass
+# **********************************************************************************************************************
+# Dispatch
+# **********************************************************************************************************************
 
-    try:
-        encoder = dict_encoder.registry[obj.__class__]
-        return encoder(obj)
-    except KeyError:
-        pass
+# How the traversal treats an object of a given type:
+#   _SCALAR   - emitted as is
+#   _LEAF     - emitted as fn(obj), not traversed any further
+#   _UNWRAP   - fn(obj) is traversed in place of obj
+#   _SEQUENCE - becomes a list of its traversed items
+#   _MAPPING  - fn(obj) yields (key, value) pairs, becomes a dict of traversed values
+#   _BUILD    - fn(obj, stack, depth) returns the dict and pushes the values still to be traversed at depth (compiled
+#               dataclass encoder)
+_SCALAR, _LEAF, _UNWRAP, _SEQUENCE, _MAPPING, _BUILD = range(6)
 
-    if obj is None:
-        return obj
+# Traversal modes, carried by every stack entry:
+#   _ENCODE          - dictify
+#   _ENCODE_DROP     - dictify_drop_empty
+#   _ENCODE_DROP_ALL - dictify_drop_empty below a dataclass: converted as by dictify, every container it converts to
+#                      is filtered, as if dictify_drop_empty were applied to the dictified dataclass
+#   _COMPACT         - obj is a converted container whose items are all done, filtered into out[key]
+_ENCODE, _ENCODE_DROP, _ENCODE_DROP_ALL, _COMPACT = range(4)
+
+# A dispatch entry is (kind, fn, child_mode): child_mode is the mode whatever obj unwraps to or contains is traversed in.
+
+
+def _dunder_dictify(obj):
+    return obj.__dictify__()
 
-    if isinstance(obj, Enum):
-        return dictify(obj.value)
 
-    if isinstance(obj, (int, float, str, bool,)):
-        return obj
+def _enum_value(obj):
+    return obj.value
 
-    if isinstance(obj, Sequence):
-        return [dictify(item) for item in obj]
 
-    if isinstance(obj, Mapping):
-        return {k: dictify(v) for k, v in obj.items()}
+def _items(obj):
+    return obj.items()
 
-    if is_dataclass(obj):
-        return {field.name: dictify(getattr(obj, field.name)) for field in fields(type(obj))}
 
-    if isinstance(obj, BaseModel):
+def _dataclass_items(obj):
+    return ((name, getattr(obj, name)) for name, _, _ in _fields_cache(type(obj)))
+
+
+def _model_value(value):
+    """Mirror of how pydantic v1 `.dict()` converts a field value: models, dicts and sequences are rebuilt, the rest
+    is kept as is."""
+    cls = type(value)
+    if cls in _MODEL_SCALARS:
+        return value
+    if isinstance(value, BaseModel):
+        result = _model_dict(value)
+        return result['__root__'] if '__root__' in result else result
+    if isinstance(value, dict):
+        return {k: _model_value(v) for k, v in value.items()}
+    if isinstance(value, _MODEL_SEQUENCES):
+        if isinstance(value, tuple) and hasattr(cls, '_fields'):  # namedtuple
+            return cls(*(_model_value(v) for v in value))
+        return cls(_model_value(v) for v in value)
+    return value
+
+
+def _model_dict(obj):
+    """Same result as `obj.dict()`, built from a snapshot of `__dict__` when `_is_plain_model`."""
+    if not _is_plain_model(type(obj)):
         return obj.dict()
 
-    raise NotImplementedError(f'Object {repr(obj)} of {type(obj)} cannot be encoded as dictionary!!!')
+    # snapshot: validators and cached properties may write to __dict__ while the values are being converted
+    return {key: _model_value(value) for key, value in list(obj.__dict__.items())}
 
 
-@singledispatch
-def empty(obj):
-    if obj is None:
-        return True
-    else:
-        try:
-            return obj.__empty__()
-        except AttributeError:
-            pass
+_MODEL_SCALARS = frozenset((int, float, str, bool, type(None),))
+
+_MODEL_SEQUENCES = (list, tuple, set, frozenset, deque, GeneratorType,)
+
 
+@lru_cache(maxsize=None)
+def _is_plain_model(cls) -> bool:
+    """Whether `cls.dict()` would give the same result as converting `__dict__`: pydantic v1, no `.dict()` override,
+    no field exclusion and no enum value substitution."""
+    if hasattr(BaseModel, 'model_dump') or cls.dict is not BaseModel.dict:
         return False
 
+    if getattr(cls.__config__, 'use_enum_values', False):
+        return False
+
+    return all(
+        getattr(field_info, 'exclude', None) is None and getattr(field_info, 'include', None) is None
+        for field_info in (getattr(field, 'field_info', None) for field in cls.__fields__.values())
+    )
+
+
+def _build_encoder(cls):
+    """
+    Compile a straight-line `encode(obj, stack, depth)` for dataclass `cls`, stored on the class as `__jsonserde_encoder__`.
+    Field values are read by attribute and stored directly; those that are not primitive are pushed for `_walk`.
+    """
+    encoder = cls.__dict__.get('__jsonserde_encoder__')
+    if encoder is not None:
+        return encoder
+
+    names = [name for name, _, _ in _fields_cache(cls)]
+    lines = ['def encode(obj, stack, depth):']
+    lines += [f'    v{idx} = obj.{name}' for idx, name in enumerate(names)]
+    lines.append('    out = {' + ', '.join(f'{name!r}: v{idx}' for idx, name in enumerate(names)) + '}')
+    for idx, name in enumerate(names):
+        lines.append(f'    if type(v{idx}) not in primitives:')
+        lines.append(f'        stack.append((v{idx}, out, {name!r}, mode, depth))')
+    lines.append('    return out')
+
+    namespace = {'primitives': _PRIMITIVES, 'mode': _ENCODE}
+    exec(compile('\n'.join(lines), f'<jsonserde:{cls.__name__}>', 'exec'), namespace)
+    encoder = cls.__jsonserde_encoder__ = namespace['encode']
+    return encoder
+
+
+_SCALAR_ENTRY = (_SCALAR, None, _ENCODE)
+
+_BUILTIN_DISPATCH = {
+    int: _SCALAR_ENTRY,
+    float: _SCALAR_ENTRY,
+    str: _SCALAR_ENTRY,
+    bool: _SCALAR_ENTRY,
+    type(None): _SCALAR_ENTRY,
+    list: (_SEQUENCE, None, _ENCODE),
+    tuple: (_SEQUENCE, None, _ENCODE),
+    dict: (_MAPPING, _items, _ENCODE),
+}
+
+# Exact type -> entry. Seeded with builtins and filled lazily by `_resolve_handler`.
+_DISPATCH = {}
+
+# Same for _ENCODE_DROP, filled lazily by `_resolve_drop_handler`.
+_DROP_DISPATCH = {}
+
+# Same for _ENCODE_DROP_ALL, filled lazily by `_resolve_drop_all_handler`.
+_DROP_ALL_DISPATCH = {}
+
+# Exact types emitted as is; items of these types are stored without going through the stack.
+_PRIMITIVES = set()
+
+
+_default_encoder = dict_encoder.dispatch(object)
+
+
+def _encoder_for(cls):
+    """Encoder registered with `dict_encoder` for `cls` or any of its bases (including ABCs), None if there is none."""
+    encoder = dict_encoder.dispatch(cls)
+    return None if encoder is _default_encoder else encoder
+
+
+def _reset_dispatch():
+    _DISPATCH.clear()
+    _DISPATCH.update({
+        cls: entry
+        for cls, entry in _BUILTIN_DISPATCH.items()
+        if _encoder_for(cls) is None
+    })
+
+    _DROP_DISPATCH.clear()
+    _DROP_ALL_DISPATCH.clear()
+
+    _PRIMITIVES.clear()
+    _PRIMITIVES.update(cls for cls, entry in _DISPATCH.items() if entry is _SCALAR_ENTRY)
+
+
+_singledispatch_register = dict_encoder.register
+
+
+def _register_encoder(cls, func=None):
+    if func is None and not inspect.isfunction(cls):  # a class or union, used as @dict_encoder.register(cls)
+        return lambda f: _register_encoder(cls, f)
+
+    func = _singledispatch_register(cls, func)
+    _reset_dispatch()
+    return func
+
 
-@empty.register
-def _(obj: dict):
-    return obj == {}
+dict_encoder.register = _register_encoder
+_reset_dispatch()
 
 
-@empty.register
-def _(obj: list):
-    return obj == []
+def _resolve_handler(obj):
+    cls = type(obj)
+
+    if hasattr(cls, '__dictify__'):
+        entry = (_UNWRAP, _dunder_dictify, _ENCODE)
+    elif (encoder := _encoder_for(cls)) is not None:
+        entry = (_LEAF, encoder, _ENCODE)
+    elif issubclass(cls, Enum):
+        entry = (_UNWRAP, _enum_value, _ENCODE)
+    elif issubclass(cls, (int, float, str, bool,)):
+        entry = _SCALAR_ENTRY
+    elif issubclass(cls, Sequence):
+        entry = (_SEQUENCE, None, _ENCODE)
+    elif issubclass(cls, Mapping):
+        entry = (_MAPPING, _items, _ENCODE)
+    elif is_dataclass(cls):
+        entry = (_BUILD, _build_encoder(cls), _ENCODE)
+    elif issubclass(cls, BaseModel):
+        entry = (_LEAF, _model_dict, _ENCODE)
+    else:
+        raise NotImplementedError(f'Object {repr(obj)} of {type(obj)} cannot be encoded as dictionary!!!')
+
+    _DISPATCH[cls] = entry
+    return entry
+
+
+try:
+    from jsonserde._fastpath import _dictify_list_primitives, _dictify_dict_primitives
+except ImportError:  # optional Cython extension not built
+    def _dictify_list_primitives(obj, primitives):
+        """Copy of sequence `obj` as a list if every item is of a type in `primitives`, else None."""
+        for item in obj:
+            if type(item) not in primitives:
+                return None
+
+        return list(obj)
+
+    def _dictify_dict_primitives(obj, primitives):
+        """Copy of mapping `obj` as a dict if every value is of a type in `primitives`, else None."""
+        for value in obj.values():
+            if type(value) not in primitives:
+                return None
+
+        return dict(obj)
+
+
+# **********************************************************************************************************************
+# Dictify Drop Empty
+# **********************************************************************************************************************
+
+def empty(obj):
+    if obj is None:
+        return True
+
+    cls = type(obj)
+    if cls is dict or cls is list:
+        return not obj
+
+    if isinstance(obj, (dict, list,)):
+        return not obj
+
+    is_empty = getattr(obj, '__empty__', None)
+    return is_empty() if is_empty is not None else False
 
 
 def _qualified(attr, value, keep_empty_array_keys: Optional[Iterable[str]] = None) -> bool:
@@ -82,26 +272,126 @@ def _qualified(attr, value, keep_empty_array_keys: Optional[Iterable[str]] = Non
         return (attr in keep_empty_array_keys and value == []) or (not empty(value))
 
 
+def _compact(obj, keep_empty_array_keys: Optional[FrozenSet[str]]):
+    if type(obj) is list:
+        return [value for value in obj if not empty(value)]
+
+    return {key: value for key, value in obj.items() if _qualified(key, value, keep_empty_array_keys)}
+
+
+def _none_if_empty(obj):
+    return None if empty(obj) else obj
+
+
+def _resolve_drop_handler(obj):
+    cls = type(obj)
+
+    if issubclass(cls, list):
+        entry = (_SEQUENCE, None, _ENCODE_DROP)
+    elif issubclass(cls, dict):
+        entry = (_MAPPING, _items, _ENCODE_DROP)
+    elif is_dataclass(cls):
+        entry = _DROP_ALL_DISPATCH.get(cls) or _resolve_drop_all_handler(obj)
+    elif cls is type(None):
+        entry = _SCALAR_ENTRY
+    elif hasattr(cls, '__empty__'):
+        entry = (_UNWRAP, _none_if_empty, _ENCODE)
+    else:  # nothing below is dropped, traversed as by dictify
+        entry = _DISPATCH.get(cls) or _resolve_handler(obj)
+
+    _DROP_DISPATCH[cls] = entry
+    return entry
+
+
+def _resolve_drop_all_handler(obj):
+    cls = type(obj)
+    kind, fn, _ = _DISPATCH.get(cls) or _resolve_handler(obj)
+
+    if kind == _SCALAR:
+        entry = _SCALAR_ENTRY
+    elif kind == _LEAF:  # the encoded form is filtered like any other dictify_drop_empty input
+        entry = (_UNWRAP, fn, _ENCODE_DROP)
+    elif kind == _BUILD:
+        entry = (_MAPPING, _dataclass_items, _ENCODE_DROP_ALL)
+    else:
+        entry = (kind, fn, _ENCODE_DROP_ALL)
+
+    _DROP_ALL_DISPATCH[cls] = entry
+    return entry
+
+
+# **********************************************************************************************************************
+# Walk
+# **********************************************************************************************************************
+
+# Deeper nesting than this is taken for a reference cycle (e.g. a list containing itself), which would never finish.
+_MAX_DEPTH = 10000
+
+
+def _walk(obj, drop: bool, keep_empty_array_keys: Optional[FrozenSet[str]]):
+    """Single traversal behind both `dictify` and `dictify_drop_empty`, driven by an explicit stack."""
+    root = [None]
+    # (obj, out, key, mode, depth): the converted obj goes into out[key]. _COMPACT entries are pushed below a
+    # container's items so they pop once its whole subtree is done.
+    stack = [(obj, root, 0, _ENCODE_DROP if drop else _ENCODE, 0)]
+
+    while stack:
+        obj, out, key, mode, depth = stack.pop()
+        if depth > _MAX_DEPTH:
+            raise RecursionError(f'Object of {type(obj)} is nested more than {_MAX_DEPTH} levels deep, '
+                                 f'possibly a reference cycle')
+
+        if mode == _ENCODE:
+            entry = _DISPATCH.get(type(obj)) or _resolve_handler(obj)
+        elif mode == _ENCODE_DROP:
+            entry = _DROP_DISPATCH.get(type(obj)) or _resolve_drop_handler(obj)
+        elif mode == _ENCODE_DROP_ALL:
+            entry = _DROP_ALL_DISPATCH.get(type(obj)) or _resolve_drop_all_handler(obj)
+        else:
+            out[key] = _compact(obj, keep_empty_array_keys)
+            continue
+        kind, fn, child_mode = entry
+
+        if kind == _SCALAR:
+            out[key] = obj
+        elif kind == _LEAF:
+            out[key] = fn(obj)
+        elif kind == _UNWRAP:
+            stack.append((fn(obj), out, key, child_mode, depth + 1))
+        elif kind == _BUILD:
+            out[key] = fn(obj, stack, depth + 1)
+        elif kind == _SEQUENCE:
+            if (result := _dictify_list_primitives(obj, _PRIMITIVES)) is not None:
+                out[key] = result if child_mode == _ENCODE else _compact(result, keep_empty_array_keys)
+                continue
+
+            result = out[key] = [None] * len(obj)
+            if child_mode != _ENCODE:
+                stack.append((result, out, key, _COMPACT, depth))
+            for idx, item in enumerate(obj):
+                if type(item) in _PRIMITIVES:
+                    result[idx] = item
+                else:
+                    stack.append((item, result, idx, child_mode, depth + 1))
+        else:
+            if fn is _items and (result := _dictify_dict_primitives(obj, _PRIMITIVES)) is not None:
+                out[key] = result if child_mode == _ENCODE else _compact(result, keep_empty_array_keys)
+                continue
+
+            result = out[key] = {}
+            if child_mode != _ENCODE:
+                stack.append((result, out, key, _COMPACT, depth))
+            for k, v in fn(obj):
+                result[k] = v
+                if type(v) not in _PRIMITIVES:
+                    stack.append((v, result, k, child_mode, depth + 1))
+
+    return root[0]
+
+
+def dictify(obj):
+    return _walk(obj, False, None)
+
+
 def dictify_drop_empty(obj, keep_empty_array_keys: Optional[Iterable[str]] = None):
-    if isinstance(obj, list):
-        return [
-            o for o in (
-                dictify_drop_empty(i, keep_empty_array_keys) for i in obj
-            ) if not empty(o)
-        ]
-
-    if isinstance(obj, dict):
-        return {
-            ko: vo
-            for ko, vo in (
-                (ki, dictify_drop_empty(vi, keep_empty_array_keys)) for ki, vi in obj.items()
-            ) if _qualified(ko, vo, keep_empty_array_keys)
-        }
-
-    if is_dataclass(obj):
-        return dictify_drop_empty(dictify(obj), keep_empty_array_keys)
-
-    if empty(obj):
-        return None
-
-    return dictify(obj)
+    return _walk(obj, True, frozenset(keep_empty_array_keys) if keep_empty_array_keys else None)
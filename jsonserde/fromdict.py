@@ -1,8 +1,10 @@
 import typing
-from typing import Type, List, Dict, NamedTuple, Set, Any
+from typing import Type, List, Dict, FrozenSet, Tuple, Optional, Union, Any
 import dataclasses
 from dataclasses import is_dataclass, dataclass
-from functools import cached_property
+from functools import lru_cache
+
+from jsonserde._fields import _fields_cache, _required_fields, _is_dataclass_field_required
 
 
 # **********************************************************************************************************************
@@ -13,12 +15,17 @@ _dict_decoder_registry = dict()
 
 
 def dict_decoder(cls):
+    """
+    Register `func(value, target, path)` as the decoder for `cls`, taking precedence over the built-in decoding.
+
+    `path` locates `value` in the input and renders as the path string, e.g. `f'{path}.amt'`. Nested values are decoded
+    with `decode_input_internal(nested, nested_target, path)`, where path is such a string or, rendered only if
+    decoding fails, `(path, 'amt')` / `(path, index)`.
+    """
     def wrapped(func):
         _dict_decoder_registry[cls] = func
-
-        def call(*args, **kwargs):
-            return func(*args, **kwargs)
-        return call
+        _plan.cache_clear()
+        return func
     return wrapped
 
 
@@ -28,6 +35,8 @@ def dict_decoder(cls):
 
 @dataclass
 class DecodeError(Exception):
+    __slots__ = ('value', 'target', 'path')
+
     value: Any
     target: Any
     path: str
@@ -35,12 +44,16 @@ class DecodeError(Exception):
 
 @dataclass
 class TypeCompileError(Exception):
+    __slots__ = ('target', 'path')
+
     target: Any
     path: Any
 
 
 @dataclass
 class MissingRequiredAttributeError(DecodeError):
+    __slots__ = ('attrs',)
+
     attrs: List[str]
 
     def __str__(self):
@@ -48,27 +61,37 @@ class MissingRequiredAttributeError(DecodeError):
 
 
 class NotAllowedTypeError(TypeCompileError):
+    __slots__ = ()
+
     def __str__(self):
         return f'target: {self.target}, path: {self.path}'
 
 
 class NotSupportedTypeError(DecodeError):
+    __slots__ = ()
+
     def __str__(self):
         return f'path: {self.path}, target: {self.target}, value: {self.value}'
 
 
 class WrongTypeError(DecodeError):
+    __slots__ = ()
+
     def __str__(self):
         return f'path: {self.path}, target: {self.target}, value: {self.value}'
 
 
 class WrongCollectionItemError(DecodeError):
+    __slots__ = ()
+
     def __str__(self):
         return f'path: {self.path}, target: {self.target}, value: {self.value}'
 
 
 @dataclass
 class WrongCollectionError(DecodeError):
+    __slots__ = ('details',)
+
     details: list
 
     def __str__(self):
@@ -76,22 +99,49 @@ class WrongCollectionError(DecodeError):
         return f'path: {self.path}, target: {self.target}, value: {self.value}, details:\n{formatted_details}'
 
 
+_NOT_ALLOWED = frozenset({
+    dataclasses.InitVar,
+    typing.Sequence,
+})
+
+
 def _is_type_not_allowed(target) -> bool:
-    _not_allowed = {
-        dataclasses.InitVar,
-        typing.Sequence,
-    }
+    return target in _NOT_ALLOWED
+
+
+# **********************************************************************************************************************
+# Path
+# **********************************************************************************************************************
+
+# Location of a value while decoding, as a linked list of (parent, segment) tuples from the innermost segment out.
+# The root is a rendered path string ('$' from `decode_input`). Segments are attribute names or list indices.
+# Only rendered to a string when an error is raised.
+_Path = Union[str, Tuple['_Path', Union[str, int]]]
+
+
+def _render(path: _Path) -> str:
+    parts = []
+    while isinstance(path, tuple):
+        path, seg = path
+        parts.append(f'[{seg}]' if type(seg) is int else f'.{seg}')
+
+    return path + ''.join(reversed(parts))
+
+
+class _DecoderPath(tuple):
+    """A (parent, segment) path as handed to registered decoders, rendered by `str()` and f-strings."""
+    __slots__ = ()
 
-    return target in _not_allowed
+    def __str__(self):
+        return _render(self)
 
 
 # **********************************************************************************************************************
 # Decode Dataclass (Nested Object)
 # **********************************************************************************************************************
 
-class FieldParam(NamedTuple):
-    type: Type
-    required: bool
+# (type, required)
+FieldParam = Tuple[Type, bool]
 
 
 class DataclsUtils:
@@ -103,41 +153,31 @@ class DataclsUtils:
     @staticmethod
     def make_field_param_lookup(datacls) -> Dict[str, FieldParam]:
         result = {}
-        for f in dataclasses.fields(datacls):
-            if _is_type_not_allowed(f.type):
-                raise NotAllowedTypeError(target=f.type, path=datacls)
+        for name, type_, required in _fields_cache(datacls):
+            if _is_type_not_allowed(type_):
+                raise NotAllowedTypeError(target=type_, path=datacls)
 
-            result[f.name] = FieldParam(type=f.type, required=_is_dataclass_field_required(f))
+            result[name] = (type_, required)
 
         return result
 
 
 class DataclsProfile:
+    __slots__ = ('_datacls', 'field_param_lookup', 'required_field_names', '_has_required')
+
     def __init__(self, datacls):
         self._datacls = datacls
+        self.field_param_lookup: Dict[str, FieldParam] = DataclsUtils.make_field_param_lookup(datacls)
+        self.required_field_names: FrozenSet[str] = _required_fields(datacls)
+        self._has_required = bool(self.required_field_names)
 
     def __repr__(self):
         return f'{type(self).__name__}(datacls={self._datacls})'
 
-    @cached_property
-    def field_param_lookup(self) -> Dict[str, FieldParam]:
-        return DataclsUtils.make_field_param_lookup(self._datacls)
-
-    @cached_property
-    def required_field_names(self) -> Set[str]:
-        return {
-            field
-            for field, (_, required) in self.field_param_lookup.items()
-            if required
-        }
-
-    def compute_missing_fields(self, payload: dict) -> Set[str]:
-        return self.required_field_names - payload.keys()
 
-
-def _is_dataclass_field_required(field: dataclasses.Field) -> bool:
-    return isinstance(field.default, dataclasses._MISSING_TYPE) \
-           and isinstance(field.default_factory, dataclasses._MISSING_TYPE)
+@lru_cache(maxsize=None)
+def _profile_for(target) -> DataclsProfile:
+    return DataclsProfile(target)
 
 
 def _dataclass_field_type_lookup(datacls) -> Dict[str, FieldParam]:
@@ -146,45 +186,125 @@ def _dataclass_field_type_lookup(datacls) -> Dict[str, FieldParam]:
         if _is_type_not_allowed(f.type):
             raise NotAllowedTypeError(f.type, msg=f'{f.type} is not supported yet.')
 
-        result[f.name] = FieldParam(type=f.type, required=_is_dataclass_field_required(f))
+        result[f.name] = (f.type, _is_dataclass_field_required(f))
 
     return result
 
 
-def _decode_dataclass(value: dict, target, path):
-    if not isinstance(value, dict):
-        raise RuntimeError(f'{value} is not a dictionary!!!')
-
-    dp = DataclsProfile(target)
+_MISSING = object()
 
-    if missing_fields := dp.compute_missing_fields(value):
-        raise MissingRequiredAttributeError(target=target, attrs=missing_fields, path=path, value=value)
 
-    payload = {}
+def _raise_unknown_key(value: dict, target, path: _Path):
+    """
+    Raise KeyError for the first key of `value` that is not a field of dataclass `target`, after decoding the fields
+    before it, so that errors come in payload order.
+    """
+    field_param_lookup = _profile_for(target).field_param_lookup
     for k, v in value.items():
-        payload[k] = decode_input_internal(v, dp.field_param_lookup[k].type, f'{path}.{k}')
+        if k not in field_param_lookup:
+            raise KeyError(k)
+
+        decode_input_internal(v, field_param_lookup[k][0], (path, k))
+
+
+def _build_decoder(target):
+    """
+    Compile a straight-line decoder `decode(value, path)` for dataclass `target`. Scalar fields are checked inline and
+    list fields go straight to the collection decoder, everything else runs the field's plan.
+    """
+    dp = _profile_for(target)
+    namespace = {
+        '_MISSING': _MISSING,
+        'target': target,
+        'required': dp.required_field_names,
+        'known': frozenset(dp.field_param_lookup),
+        'raise_unknown_key': _raise_unknown_key,
+        'run_plan': _run_plan,
+        'decode_collection': _decode_homogeneous_typing_collection,
+        'MissingRequiredAttributeError': MissingRequiredAttributeError,
+        'WrongTypeError': WrongTypeError,
+        'render': _render,
+    }
+    lines = [
+        'def decode(value, path):',
+        '    if not isinstance(value, dict):',
+        "        raise RuntimeError(f'{value} is not a dictionary!!!')",
+    ]
+    if dp._has_required:
+        lines += [
+            '    missing_fields = required.difference(value)',
+            '    if missing_fields:',
+            '        raise MissingRequiredAttributeError(target=target, attrs=set(missing_fields), path=render(path), '
+            'value=value)',
+        ]
+    lines += [
+        '    if not known.issuperset(value):',
+        '        raise_unknown_key(value, target, path)',
+        '    payload = {}',
+    ]
+    for idx, (name, (type_, _)) in enumerate(dp.field_param_lookup.items()):
+        plan = namespace[f'plan_{idx}'] = _plan(type_)
+        lines.append(f'    v = value.get({name!r}, _MISSING)')
+        lines.append('    if v is not _MISSING:')
+        if plan[0] == 'scalar' and type_ in _SCALAR_TARGETS:
+            namespace[f'type_{idx}'] = type_
+            lines.append(f'        if type(v) is not type_{idx} and not isinstance(v, type_{idx}):')
+            lines.append(f"            raise WrongTypeError(value=v, target=type_{idx}, path=render((path, {name!r})))")
+            lines.append(f'        payload[{name!r}] = v')
+        elif plan[0] == 'list':
+            lines.append(
+                f'        payload[{name!r}] = decode_collection(v, plan_{idx}[1], plan_{idx}[2], '
+                f"(path, {name!r}), plan_{idx}[3])"
+            )
+        else:
+            lines.append(f"        payload[{name!r}] = run_plan(plan_{idx}, v, (path, {name!r}))")
+    lines.append('    return target(**payload)')
 
-    return target(**payload)
+    exec(compile('\n'.join(lines), f'<jsonserde:{target.__name__}>', 'exec'), namespace)
+    return namespace['decode']
 
 # **********************************************************************************************************************
 # Decode Typing Annotation
 # **********************************************************************************************************************
 
+_SCALAR_TARGETS = frozenset({int, float, str, bool})
+_LIST_ORIGINS = frozenset({list})
 
-def _decode_homogeneous_typing_collection(value, origin, inner, path):
-    res = []
+
+try:
+    from jsonserde._fastpath import _decode_scalar_list
+except ImportError:  # optional Cython extension not built
+    def _decode_scalar_list(value, inner):
+        """Copy of `value` if it is a list whose items are all exactly of type `inner`, else None."""
+        if type(value) is not list:
+            return None
+
+        for item in value:
+            if type(item) is not inner:
+                return None
+
+        return list(value)
+
+
+def _decode_homogeneous_typing_collection(value, origin, inner, path: _Path, inner_plan):
+    if inner_plan[0] == 'scalar' and inner in _SCALAR_TARGETS \
+            and (res := _decode_scalar_list(value, inner)) is not None:
+        return res if origin is list else origin(res)
+
+    items = value if type(value) is list else list(value)
+    n = len(items)
+    res = [None] * n
     errs = []
-    for idx, item in enumerate(value):
-        inner_path = f'{path}[{idx}]'
+    for idx in range(n):
+        item = items[idx]
 
         try:
-            decoded = decode_input_internal(item, inner, inner_path)
-            res.append(decoded)
+            res[idx] = _run_plan(inner_plan, item, (path, idx))
         except DecodeError:
             err = WrongCollectionItemError(
                 value=item,
                 target=inner,
-                path=inner_path
+                path=_render((path, idx))
             )
             errs.append(err)
 
@@ -192,40 +312,105 @@ def _decode_homogeneous_typing_collection(value, origin, inner, path):
         raise WrongCollectionError(
             value=value,
             target=origin,
-            path=path,
+            path=_render(path),
             details=errs
         )
 
-    return origin(res)
+    return res if origin is list else origin(res)
 
 
-def _decode_typing_annotation(value, target, path):
-    if (origin := target.__origin__) in {list, }:
-        inner = target.__args__[0]
-        return _decode_homogeneous_typing_collection(value, origin, inner, path)
+@lru_cache(maxsize=None)
+def _typing_plan(target) -> Optional[Tuple[Any, Any]]:
+    if (origin := target.__origin__) in _LIST_ORIGINS:
+        return origin, target.__args__[0]
+
+    return None
 
 
 # **********************************************************************************************************************
-# Decode Input
+# Decode Plan
 # **********************************************************************************************************************
 
-def decode_input_internal(value, target, path):
+@lru_cache(maxsize=None)
+def _plan(target) -> tuple:
+    """
+    How to decode into `target`, resolved once per target:
+        ('registered', target, decoder)   registered with @dict_decoder
+        ('scalar', target)
+        ('dataclass', target, [decoder])  decoder compiled on first run, so a dataclass may be nested in itself
+        ('list', origin, inner, inner_plan)
+        ('typing', target)   other typing annotations, not supported yet
+    """
+    if (decoder := _dict_decoder_registry.get(target)) is not None:
+        return 'registered', target, decoder
+
     if hasattr(target, '__origin__'):  # typing
-        return _decode_typing_annotation(value, target, path)
+        if typing_plan := _typing_plan(target):
+            origin, inner = typing_plan
+            return 'list', origin, inner, _plan(inner)
+        return 'typing', target
 
     if is_dataclass(target):
-        return _decode_dataclass(value, target, path)
+        return 'dataclass', target, [None]
+
+    return 'scalar', target
+
+
+def _run_registered_plan(plan, value, path):
+    return plan[2](value, plan[1], path if type(path) is str else _DecoderPath(path))
 
-    if isinstance(value, target):
+
+def _run_scalar_plan(plan, value, path):
+    target = plan[1]
+    if type(value) is target or isinstance(value, target):
         return value
     else:
         raise WrongTypeError(
             value=value,
             target=target,
-            path=path
+            path=_render(path)
         )
 
-    raise NotSupportedTypeError(value=value, target=target, path=path)
+
+def _run_dataclass_plan(plan, value, path):
+    decoder = plan[2][0]
+    if decoder is None:
+        decoder = plan[2][0] = _build_decoder(plan[1])
+
+    return decoder(value, path)
+
+
+def _run_list_plan(plan, value, path):
+    _, origin, inner, inner_plan = plan
+    return _decode_homogeneous_typing_collection(value, origin, inner, path, inner_plan)
+
+
+def _run_typing_plan(plan, value, path):
+    return None  # only List[...] is decoded so far
+
+
+_PLAN_RUNNERS = {
+    'registered': _run_registered_plan,
+    'scalar': _run_scalar_plan,
+    'dataclass': _run_dataclass_plan,
+    'list': _run_list_plan,
+    'typing': _run_typing_plan,
+}
+
+
+def _run_plan(plan, value, path):
+    return _PLAN_RUNNERS[plan[0]](plan, value, path)
+
+
+# **********************************************************************************************************************
+# Decode Input
+# **********************************************************************************************************************
+
+def decode_input_internal(value, target, path: _Path):
+    if type(value) is target and target in _SCALAR_TARGETS and target not in _dict_decoder_registry:
+        return value
+
+    return _run_plan(_plan(target), value, path)
 
 
 def decode_input(value, target: Type):